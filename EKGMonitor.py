@@ -23,6 +23,7 @@ Paul B. Manis, Ph.D. July 21-31, 2016
 """
 import sys
 import datetime
+import logging
 import pickle
 import platform
 import serial
@@ -35,6 +36,8 @@ from pyqtgraph.parametertree import Parameter, ParameterTree
 #import sounddevice as sd
 from biosppy.signals import ecg as b_ecg
 
+logger = logging.getLogger(__name__)  # diagnostics from the acquisition path; silent unless configured
+
 # perform some initialization and system-dependent activities.
 # The "s.default_device" parameter may need to be set to correct select from the hardware that is 
 # available on a given system. The printed "devices" list should help with this.
@@ -43,6 +46,7 @@ from biosppy.signals import ecg as b_ecg
 mode = 'olimex'  # use olimex on arduino
 #mode - 'soundcard'  # use system sound card
 assert mode in ['olimex', 'soundcard']
+testMode = False  # if True, read test files from disk; no acquisition hardware is opened
 
 # if mode == 'soundcard':
 #     devices = sd.query_devices()
@@ -64,45 +68,46 @@ class Arduino():
     def __init__(self, buffer):# routines for talking to arduino
         self.serbuf = buffer
         
-    def read_data_buffer(self):
-        b = ''
-        inbuf = False
-        while self.serbuf.inWaiting() > 0:  # read the whole buffer
-            c = self.serbuf.read()
-            if c == '[':
-                inbuf = True
-                continue
-            if inbuf and c == ']':
-                return b
-            else:
-                if inbuf:
-                    b+=c
-        return b
+    def read_data_buffer(self, timeout=0., poll=0.002):
+        b = self.serbuf.read(self.serbuf.inWaiting())  # read the whole buffer at once
+        a = time.time()
+        while ']' not in b and (time.time() - a) < timeout:  # wait for the rest of the frame
+            time.sleep(poll)
+            b += self.serbuf.read(self.serbuf.inWaiting())
+        if timeout > 0 and ']' not in b:  # frame never completed; do not return a partial frame
+            print('ard timeout on wait')
+            return ''
+        start = b.find('[')
+        if start < 0:
+            return ''
+        end = b.find(']', start)
+        if end < 0:
+            return b[start+1:]
+        return b[start+1:end]
 
     def send_command(self, c):
         self.serbuf.write(c)
         
     def read_response(self):
-        b = ''
-        while self.serbuf.inWaiting() > 0:  # read the whole buffer
-            b += self.serbuf.read()
-        return b
+        n = self.serbuf.inWaiting()
+        if n == 0:  # nothing waiting: skip the read entirely
+            return ''
+        return self.serbuf.read(n)  # read the whole buffer in one call
 
     def flushbuf(self):
-        while self.serbuf.inWaiting() > 0:
-            self.serbuf.read()
+        n = self.serbuf.inWaiting()
+        if n > 0:
+            self.serbuf.read(n)
 
     def wait_done(self):
-        while self.serbuf.inWaiting() == 0:
-            pass
-        c = self.serbuf.read()
+        c = self.serbuf.read()  # blocks until a character arrives
         self.flushbuf()
 
-    def wait_response(self, timeout=2):
-        a = time.clock()
+    def wait_response(self, timeout=2, poll=0.002):
+        a = time.time()
         while self.serbuf.inWaiting() == 0:
-            if (time.clock() - a) < timeout:
-                pass
+            if (time.time() - a) < timeout:
+                time.sleep(poll)  # yield the cpu rather than spinning
             else:
                 print('ard timeout on wait')
                 return
@@ -128,6 +133,7 @@ class Arduino():
     #    self.wait_response()
         print self.read_response()
     #    ard_flushbuf(s)
+        self.samplerate = rate  # seconds/point actually programmed into the board
         self.sampleduration = points * rate
         print 'sampledur: ', self.sampleduration
         self.serbuf.write('i')
@@ -140,13 +146,14 @@ if mode == 'olimex':
     NChannels = 1
     DEFAULT_BAUDRATE = 115200
     source = 'COM23' # /dev/cu.usbmodem621'
-    serial_obj = serial.Serial(source, DEFAULT_BAUDRATE)
-    Ard = Arduino(serial_obj)
-    Ard.flushbuf()
-    time.sleep(1)
-    Ard.set_sample(0.008, 256)
-#    Ard.sampleduration = 0.004*256
-    print('ard olimex serial set')
+    if not testMode:  # test files do not need the serial port (which may not exist)
+        serial_obj = serial.Serial(source, DEFAULT_BAUDRATE)
+        Ard = Arduino(serial_obj)
+        Ard.flushbuf()
+        time.sleep(1)
+        Ard.set_sample(0.008, 256)
+    #    Ard.sampleduration = 0.004*256
+        print('ard olimex serial set')
     
 
 # files that can be read from disk, with information and needed parameters
@@ -159,8 +166,10 @@ knownFiles = {'EKG_testsignals.snd': {'fs': 1000., 'subject': 'human',
 #fname='EKG_testsignals.snd' #CHANGE THIS AS NEEDED
 #fname = 'scottecg.snd'
 fname = 'mouseECG.p'
-testMode = False
 
+# sample periods (s) that checkfs will try on the sound card
+possibleSamplerates = [1./1000, 1./2000, 1./4000, 1./8000, 1./11025, 1./22050,
+                       1./32000, 1./44100, 1./48000, 1./96000, 1./128000]
 
 def checkfs():
     """
@@ -176,8 +185,6 @@ def checkfs():
     -------
     supported samplerates, as a list that is a subset of the possible sample rates
     """
-    possibleSamplerates = [1./1000, 1./2000, 1./4000, 1./8000, 1,.11025, 1/22050, 
-                            1./32000, 1./44100, 1./48000, 1./96000, 1./128000]
     device = sd.default.device[0]
 
     supported_samplerates = []
@@ -214,6 +221,7 @@ class MeasureECG:
             self.device = sd.default.device[0] # define sound card
         else:
             self.device = None
+        self.stream = None  # sound card input stream, opened on first capture
         self.NChannels = NChannels
         self.fs = samplerates[0]  # use the lowest one we found
         if self.fs > 2*self.analysisSampleFreq:
@@ -227,6 +235,13 @@ class MeasureECG:
             self.invertData = False
         self.NotchFreq = 60.
         self.NotchEnabled = True
+        # filter coefficients are designed on first use, and only redesigned
+        # when the design parameters differ from those of the last design
+        self.LPFKey = None
+        self.LPFCoeffs = None
+        self.NotchKey = None
+        self.NotchCoeffs = None
+        self.fileCache = {}  # decimated test file data, by (filename, decimation)
 
     def setfs(self, fs):
         self.fs = fs  # set from file and compute a new decimation value
@@ -267,8 +282,11 @@ class MeasureECG:
         -------
         filtered data
         """
-        coeffs = scipy.signal.firwin(numtaps, fc/(self.sampleFreq/2.0), pass_zero=True)
-        dfilt = scipy.signal.lfilter(coeffs, 1.0, data)
+        key = (fc, numtaps, self.sampleFreq)
+        if key != self.LPFKey:  # parameters changed since last design
+            self.LPFCoeffs = scipy.signal.firwin(numtaps, fc/(self.sampleFreq/2.0), pass_zero=True)
+            self.LPFKey = key
+        dfilt = scipy.signal.lfilter(self.LPFCoeffs, 1.0, data)
         return dfilt
 
     def NotchFilter(self, data, fn=60., Q=50.):
@@ -289,12 +307,16 @@ class MeasureECG:
         -------
         filtered data
         """
-        fnyq = fn/(self.sampleFreq/2.0)
-        wp = [0.96*fnyq, 1.04*fnyq]
-        ws = [0.99*fnyq, 1.01*fnyq]
-        
-        # b, a = scipy.signal.iirnotch(fn/(self.sampleFreq/2.0), Q)  # scipy 19... not yet available
-        b, a = scipy.signal.iirdesign(wp, ws, gpass=1.0, gstop=60.)
+        key = (fn, self.sampleFreq)
+        if key != self.NotchKey:  # parameters changed since last design
+            fnyq = fn/(self.sampleFreq/2.0)
+            wp = [0.96*fnyq, 1.04*fnyq]
+            ws = [0.99*fnyq, 1.01*fnyq]
+
+            # b, a = scipy.signal.iirnotch(fn/(self.sampleFreq/2.0), Q)  # scipy 19... not yet available
+            self.NotchCoeffs = scipy.signal.iirdesign(wp, ws, gpass=1.0, gstop=60.)
+            self.NotchKey = key
+        b, a = self.NotchCoeffs
         dfilt = scipy.signal.lfilter(b, a, data)
         return dfilt
         
@@ -326,38 +348,44 @@ class MeasureECG:
             self.invertData = True
         else:
             self.invertData = False
-        if finfo['type'] in ['snd']:
-            self.currentSegment = np.memmap(fname, dtype='h', mode='r')
-        elif finfo['type'] in ['pickled']:
-            try:
-                fh = open(fname, 'rb')
-                self.currentSegment = pickle.load(fh)
-                fh.close()
-            except:
-                try:
-                    fh = open(fname, 'rU')  # possibly text file from windows..
-                    self.currentSegment = pickle.load(fh)
-                    fh.close()
-                except:
-                    raise ValueError('sorry, unable to unpickle')
-                
-        else:
-            raise ValueError('loadFile: type %s not supported' % finfo['type'])
         if finfo['fs'] is not None:
             Hz = finfo['fs']
             self.sampleFreq = Hz
             self.setfs(Hz)
-        self.xs = np.linspace(0., len(self.currentSegment)*Hz,
-             len(self.currentSegment))   # generate x time base axis
-        rawlen = length*self.decimate
-        sa = int(startAt*self.decimate)
-        self.currentSegment = self.currentSegment[sa:sa+rawlen]  # slice out desired region
-        self.xs = self.xs[sa:sa+rawlen]
-        if len(self.currentSegment.shape) > 1:  # depends on how many channels recorded and which needed
-            self.currentSegment = scipy.signal.decimate(self.currentSegment[:,finfo['channel']], self.decimate)
+        key = (fname, self.decimate)
+        if key in self.fileCache:  # already read and decimated; the file is only read once per session
+            self.currentSegment = self.fileCache[key]
         else:
-            self.currentSegment = scipy.signal.decimate(self.currentSegment, self.decimate)
+            if finfo['type'] in ['snd']:
+                self.currentSegment = np.memmap(fname, dtype='h', mode='r')
+            elif finfo['type'] in ['pickled']:
+                try:
+                    with open(fname, 'rb') as fh:
+                        self.currentSegment = pickle.load(fh)
+                except:
+                    try:
+                        with open(fname, 'rU') as fh:  # possibly text file from windows..
+                            self.currentSegment = pickle.load(fh)
+                    except:
+                        raise ValueError('sorry, unable to unpickle')
+
+            else:
+                raise ValueError('loadFile: type %s not supported' % finfo['type'])
+            if len(self.currentSegment.shape) > 1:  # depends on how many channels recorded and which needed
+                self.currentSegment = self.currentSegment[:,finfo['channel']]
+            # decimate the whole file once, as a contiguous float array; segments are then just slices.
+            # (memory is that of the decimated file, which is small for the test files)
+            self.currentSegment = scipy.signal.decimate(
+                np.ascontiguousarray(self.currentSegment, dtype=np.float64), self.decimate)
+            self.fileCache[key] = self.currentSegment
         self.sampleFreq = self.sampleFreq/self.decimate  # update sample frequency
+        sa = int(startAt)
+        if length is not None:
+            self.currentSegment = self.currentSegment[sa:sa+int(length)]  # slice out desired region
+        else:
+            self.currentSegment = self.currentSegment[sa:]
+        # x time base axis (s), for the extracted region only
+        self.xs = (sa + np.arange(len(self.currentSegment)))/self.sampleFreq
         duration = len(self.currentSegment)/self.sampleFreq
         self.lastTimes = np.linspace(0, duration, self.currentSegment.shape[0])  # time base
     
@@ -378,29 +406,33 @@ class MeasureECG:
         """
 
         if self.device is not None:
-            try:
-                sd.check_input_settings(self.device, samplerate=int(self.fs), channels=self.NChannels)
-            except:
-                raise ValueError('Invalid sample rate for input device')
-            self.currentSegment = sd.rec(int(duration / self.fs), samplerate=int(1./self.fs), 
-                    blocking=True, channels=2)
+            if self.stream is None:  # open the input stream once, then reuse it for every segment
+                try:
+                    sd.check_input_settings(self.device, samplerate=int(1./self.fs), channels=self.NChannels)
+                except:
+                    raise ValueError('Invalid sample rate for input device')
+                self.stream = sd.InputStream(device=self.device, samplerate=int(1./self.fs),
+                    channels=self.NChannels)
+            self.stream.start()
+            self.currentSegment, overflowed = self.stream.read(int(duration / self.fs))
+            self.stream.stop()
+            if overflowed:
+                print('sound card input overflowed; segment may have dropped samples')
             self.currentSegment = scipy.signal.decimate(self.currentSegment[:,1], self.decimate)
             self.sampleFreq = (1./self.fs)/self.decimate
             self.lastTimes = np.linspace(0, duration, self.currentSegment.shape[0])
         else: # read from adruino/olimex
             Ard.send_command('a')
-            time.sleep(Ard.sampleduration*2.+0.2)
-            Ard.wait_response(timeout=2.)
-            b = Ard.read_data_buffer()
+            # return as soon as the closing ']' arrives, rather than after a fixed sleep
+            b = Ard.read_data_buffer(timeout=Ard.sampleduration*2.+2.2)
             if len(b) == 0:
                  return
-            b = '[' + b + ']'
-            ib = np.array(eval(b))
-            self.currentSegment = ib # scipy.signal.decimate(ib, self.decimate)
+            self.currentSegment = np.fromstring(b.strip().rstrip(','), dtype=float, sep=',')  # parse values in C
             self.currentSegment = self.currentSegment - np.mean(self.currentSegment)
-            self.sampleFreq = (1./self.fs)# /self.decimate
-            print self.sampleFreq
-            self.lastTimes = np.linspace(0, duration, len(self.currentSegment))
+            # the frame length and rate are set by the board (set_sample), not by duration or self.fs
+            self.sampleFreq = 1./Ard.samplerate
+            logger.debug('sampleFreq: %s', self.sampleFreq)
+            self.lastTimes = np.arange(len(self.currentSegment))/self.sampleFreq
         
             
 
@@ -411,6 +443,15 @@ class Updater():
     This class should be instantiated (updater = Updater()), and after configuration,
     a call to updater.update(...) used to update the data and display to the screen
     """
+    # parameter tree entries, and the Updater attributes that hold their values
+    paramAttributes = {'Filename': 'filename', 'Interval': 'readInterval', 'Duration': 'readDuration',
+                       'Invert': 'invertData', 'MaxSamples': 'maxSamples', 'LPF': 'LPFFreq',
+                       'Notch': 'NotchFreq', 'NotchEnabled': 'NotchEnabled', 'Info': 'InfoText'}
+    # parameter tree actions, and the Updater methods they call
+    paramActions = {'Start New': 'startRun', 'Stop/Pause': 'stopRun', 'Continue': 'continueRun',
+                    'Save Visible': 'storeData', 'Load File': 'selectAndLoadData',
+                    'New Filename': 'makeFilename'}
+
     def __init__(self, testMode, ecg, pltd=None, params=None, ptree=None, invert=False, notchEnabled=True):
         """
         Parameters
@@ -440,6 +481,17 @@ class Updater():
         self.filename = None
         self.InfoText = ''
         self.ptreedata = ptree
+        self.currentWave = None  # curve item for the current templates, reused across runs
+        # pens and brushes for the plots, made once and shared by every update
+        self.pens = {'filtered': pg.mkPen('g'), 'raw': pg.mkPen('r'), 'rate': pg.mkPen('r', width=1),
+                     'var': pg.mkPen('b'), 'none': pg.mkPen(None), 'RRI': pg.mkPen('c'),
+                     'first': pg.mkPen('r', width=0.5), 'current': pg.mkPen('w', width=0.5)}
+        self.brushes = {'rate': pg.mkBrush('r'), 'var': pg.mkBrush('b'), 'RRI': pg.mkBrush('c')}
+        # acquisition and file-write timers are created once and restarted for each run
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.update)
+        self.timedWrite = QtCore.QTimer()
+        self.timedWrite.timeout.connect(self.storeData)
         self.prepareRun()
 
     def setSampling(self, interval=5., duration=1.):
@@ -485,9 +537,7 @@ class Updater():
         -------
         Nothing
         """
-        n = datetime.datetime.now()
-        self.filename = ('{0:04d}.{1:02d}.{2:02d}_{3:02d}.{4:02d}.{5:02d}.p'.
-            format(n.year, n.month, n.day, n.hour, n.minute, n.second))
+        self.filename = datetime.datetime.now().strftime('%Y.%m.%d_%H.%M.%S.p')
         acqProp = self.ptreedata.child('Acquisition Parameters')
         acqProp['Filename'] = self.filename
 
@@ -507,7 +557,7 @@ class Updater():
         
         """
         for param, change, data in changes:
-            path = ptreedata.childPath(param)
+            path = self.ptreedata.childPath(param)
             # if path is not None:
             #     childName = '.'.join(path)
             # else:
@@ -515,41 +565,15 @@ class Updater():
             #
             # Parameters and user-supplied information
             #
-            if path[1] == 'Filename':
-                self.filename = data
-            if path[1] == 'Interval':
-                self.readInterval = data
-            if path[1] == 'Duration':
-                self.readDuration = data
-            if path[1] == 'Invert':
-                self.invertData = data
-            if path[1] == 'MaxSamples':
-                self.maxSamples = data
-            if path[1] == 'LPF':
-                self.LPFFreq = data
-            if path[1] == 'Notch':
-                self.NotchFreq = data
-            if path[1] == 'NotchEnabled':
-                self.NotchEnabled = data
-            if path[1] == 'Info':
-                self.InfoText = data
+            if path[1] in self.paramAttributes:
+                setattr(self, self.paramAttributes[path[1]], data)
+                if path[1] == 'Interval' and self.timer.isActive():
+                    self.timer.setInterval(int(self.readInterval * 1000))  # only the timing changes
             #
             # Actions:
             #
-            if path[1] == 'Start New':
-                self.startRun()
-            if path[1] == 'Stop/Pause':
-                self.stopRun()
-            if path[1] == 'Continue':
-                self.continueRun()
-            if path[1] == 'Save Visible':
-                self.storeData()
-            if path[1] == 'Load File':
-                fn = self.getFilename()
-                if fn is not None:
-                    self.loadData(filename=fn)
-            if path[1] == 'New Filename':
-                self.filename = self.makeFilename()
+            elif path[1] in self.paramActions:
+                getattr(self, self.paramActions[path[1]])()
     
     def setAllParameters(self, params):
         """
@@ -618,10 +642,6 @@ class Updater():
         Nothing        
         
         """
-        self.timer = QtCore.QTimer()
-        self.timer.timeout.connect(updater.update)
-        self.timedWrite = QtCore.QTimer()
-        self.timedWrite.timeout.connect(updater.storeData)
         self.update() # do the first update, then start time
         self.timer.start(self.readInterval * 1000)
         self.timedWrite.start(30 * 1000.)  # update file in 1 minute increments
@@ -658,8 +678,6 @@ class Updater():
         self.runningVar = []
         self.runningTime = []
         self.RRInterval = []
-        self.varplot = None
-        self.currentWave = []
         self.out = []
         self.makeFilename()
         
@@ -730,6 +748,22 @@ class Updater():
         else:
             return(None)
 
+    def selectAndLoadData(self):
+        """
+        Ask the user for a data file, and load and display it
+        
+        Parameters
+        ----------
+        None
+        
+        Returns
+        -------
+        Nothing
+        """
+        fn = self.getFilename()
+        if fn is not None:
+            self.loadData(filename=fn)
+
     def storeData(self):
         """
         Store data to data structure:
@@ -758,7 +792,7 @@ class Updater():
         acqProp = self.ptreedata.child('Acquisition Parameters')
         self.filename = acqProp['Filename']
         with open(self.filename, 'wb') as fh:
-            pickle.dump(data, fh)
+            pickle.dump(data, fh, pickle.HIGHEST_PROTOCOL)  # binary; protocol 0 writes every number as text
 
     def loadData(self, filename=None):
         """
@@ -816,14 +850,15 @@ class Updater():
         -------
         Nothing
         """
-        if testMode:
+        if self.testMode:
             self.ecg.loadFile(fname, startAt=self.NSamples*self.clips, length=self.clips)
         else:
             self.ecg.captureSegment(duration=self.readDuration)
+        # remove the mean into a single new array (the source may be cached file data), then invert in place
+        segment = self.ecg.currentSegment - np.mean(self.ecg.currentSegment)
         if self.invertData:
-            self.ecg.currentSegment = - self.ecg.currentSegment
-        self.ecg.currentSegment = self.ecg.currentSegment - np.mean(self.ecg.currentSegment) 
-        filtered_signal = self.ecg.currentSegment
+            np.negative(segment, out=segment)
+        self.ecg.currentSegment = segment
         filtered_signal = self.ecg.LPFilter(self.ecg.currentSegment,
                          fc=self.LPFFreq/self.ecg.sampleFreq)
         if self.ecg.NotchEnabled:
@@ -831,7 +866,7 @@ class Updater():
                          fn=self.NotchFreq/self.ecg.sampleFreq)
         ctime = datetime.datetime.now()
         self.runtime = (ctime - self.startTime).seconds/60.
-        self.pltd['plt_first'].plot(self.ecg.lastTimes, filtered_signal, clear=True, pen=pg.mkPen('g'))
+        self.pltd['plt_first'].plot(self.ecg.lastTimes, filtered_signal, clear=True, pen=self.pens['filtered'])
         try:  # do analysis on potential ecg signal
             self.out.append(b_ecg.ecg(signal=filtered_signal, sampling_rate=self.ecg.sampleFreq,
                  show=False, before=0.1, after=0.15))
@@ -839,21 +874,24 @@ class Updater():
             print 'No beats detected'
             self.NSamples = self.NSamples + 1
             # then plot to the template window to show us what is really there
-            self.pltd['plt_first'].plot(self.ecg.lastTimes, self.ecg.currentSegment, clear=True, pen=pg.mkPen('r'))
+            self.pltd['plt_first'].plot(self.ecg.lastTimes, self.ecg.currentSegment, clear=True, pen=self.pens['raw'])
             return
-        print "%s   %8.1f bpm" % (ctime, np.mean(self.out[-1]['heart_rate']))
-        self.runningRate.append(np.mean(self.out[-1]['heart_rate']))
-        self.runningVar.append(np.std(self.out[-1]['heart_rate']))
+        result = self.out[-1]  # the analysis just added
+        meanRate = np.mean(result['heart_rate'])  # computed once, used for report and record
+        print "%s   %8.1f bpm" % (ctime, meanRate)
+        self.runningRate.append(meanRate)
+        self.runningVar.append(np.std(result['heart_rate']))
         self.runningTime.append(self.runtime)
-        interval = np.diff(self.out[-1]['ts'][self.out[-1]['rpeaks']])    
+        interval = np.diff(result['ts'][result['rpeaks']])
         self.RRInterval.append(interval)
         self.plotResults()
 
-        pg.QtGui.QApplication.processEvents()
         self.NSamples = self.NSamples + 1
         if self.NSamples >= self.maxSamples:
             print 'Max samples reached, stopping', self.maxSamples, self.NSamples
             self.timer.stop()
+            self.timedWrite.stop()  # nothing more will change; write once rather than every 30 s
+            self.storeData()
             return
 
     def plotResults(self, readmode=False):
@@ -869,38 +907,38 @@ class Updater():
         -------
         Nothing
         """
-        self.pltd['plt_hr'].plot(self.runningTime, self.runningRate, pen=pg.mkPen('r', width=1),
-            symbol='s', symbolSize=6, symbolBrush=pg.mkBrush('r'), symbolPen=None,
+        self.pltd['plt_hr'].plot(self.runningTime, self.runningRate, pen=self.pens['rate'],
+            symbol='s', symbolSize=6, symbolBrush=self.brushes['rate'], symbolPen=None,
             clear=True)
-#        if self.varplot is not None:
-#            self.pltd['plt_var'].removeItem(self.varplot)
-        self.pltd['plt_var'].plot(self.runningTime, self.runningVar, pen=pg.mkPen('b'),
-            symbol='o', symbolSize=6, symbolBrush=pg.mkBrush('b'), symbolPen=None,
+        self.pltd['plt_var'].plot(self.runningTime, self.runningVar, pen=self.pens['var'],
+            symbol='o', symbolSize=6, symbolBrush=self.brushes['var'], symbolPen=None,
             clear=True)
-        # self.pltd['plt_var'].addItem(self.varplot)
 
-        if readmode:
-            for intvl in self.RRInterval:
-                self.pltd['plt_RRI'].plot(intvl[1:], intvl[:-1], pen=pg.mkPen(None),
-                symbol='o', symbolSize=4, symbolBrush=pg.mkBrush('c'), symbolPen=pg.mkPen('c'), 
-                clear=False)
+        if readmode:  # all stored intervals go in one plot call, not one plot item per sample
+            if len(self.RRInterval) > 0:
+                self.pltd['plt_RRI'].plot(np.concatenate([intvl[1:] for intvl in self.RRInterval]),
+                    np.concatenate([intvl[:-1] for intvl in self.RRInterval]), pen=self.pens['none'],
+                    symbol='o', symbolSize=4, symbolBrush=self.brushes['RRI'], symbolPen=self.pens['RRI'], 
+                    clear=False)
         else:
             self.pltd['plt_RRI'].plot(self.RRInterval[-1][1:], self.RRInterval[-1][:-1],
-                pen=pg.mkPen(None),
-                symbol='o', symbolSize=4, symbolBrush=pg.mkBrush('c'), symbolPen=pg.mkPen('c'), 
+                pen=self.pens['none'],
+                symbol='o', symbolSize=4, symbolBrush=self.brushes['RRI'], symbolPen=self.pens['RRI'], 
                 clear=False)
+        templates = self.out[-1]['templates']  # look up the latest analysis once
+        templates_ts = self.out[-1]['templates_ts']
         if self.NSamples == 0 or readmode is True:
-            for j in range(self.out[-1]['templates'].shape[0]):
-                self.pltd['plt_first'].plot(self.out[-1]['templates_ts'], self.out[-1]['templates'][j],
-                    pen=pg.mkPen('r', width=0.5))
-        if len(self.currentWave) > 0:
-            for j in range(len(self.currentWave)):
-                self.pltd['plt_current'].removeItem(self.currentWave[j]) # remove previous plots
-            self.currentWave = []
-        for j in range(self.out[-1]['templates'].shape[0]):
-            self.currentWave.append(pg.PlotCurveItem(self.out[-1]['templates_ts'],
-                self.out[-1]['templates'][j], pen=pg.mkPen('w', width=0.5)))
-            self.pltd['plt_current'].addItem(self.currentWave[-1])
+            for j in range(templates.shape[0]):
+                self.pltd['plt_first'].plot(templates_ts, templates[j], pen=self.pens['first'])
+        # all current templates are drawn by one curve item, created once and updated in place;
+        # the connect array breaks the line between successive templates
+        npts = len(templates_ts)
+        connect = np.ones(templates.size, dtype=bool)
+        connect[npts-1::npts] = False
+        if self.currentWave is None:
+            self.currentWave = pg.PlotCurveItem(pen=self.pens['current'])
+            self.pltd['plt_current'].addItem(self.currentWave)
+        self.currentWave.setData(np.tile(templates_ts, templates.shape[0]), templates.ravel(), connect=connect)
 
 
 if __name__ == '__main__':